@@ -0,0 +1,302 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+"""
+AI Response Cache for GymGenius
+===============================
+
+Caches AI provider responses so near-identical prompts ("give me a 3-day
+beginner split") are answered without a paid, multi-second provider call.
+
+**Features:**
+- Cache keys built from the normalized prompt, provider, model and
+  generation parameters
+- TTL expiry on every entry
+- In-process backend with size-bounded LRU eviction
+- Redis-protocol backend shared across workers (eviction is delegated to
+  the server's ``maxmemory-policy``, e.g. ``allkeys-lru``)
+- Hit/miss counters
+- Singleflight coalescing of identical in-flight requests
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+T = TypeVar("T")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-fold and collapse whitespace so trivially different prompts
+    share a cache entry"""
+    return _WHITESPACE_RE.sub(" ", prompt).strip().casefold()
+
+
+def build_cache_key(
+    prompt: str,
+    provider: str,
+    model: Optional[str],
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Build a stable cache key for a generation request"""
+    payload = json.dumps(
+        {
+            "prompt": normalize_prompt(prompt),
+            "provider": provider.lower().strip(),
+            "model": model or "",
+            "params": params or {},
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CacheBackend(ABC):
+    """Abstract storage backend for cached AI responses"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None if missing or expired"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        """Store a value that expires after ttl_seconds"""
+        pass
+
+    async def aclose(self) -> None:
+        """Release resources held by the backend"""
+        return None
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Per-process cache with TTL expiry and size-bounded LRU eviction"""
+
+    def __init__(self, max_entries: int = 1024):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache backend speaking the Redis protocol.
+
+    Accepts any client exposing ``redis.asyncio``'s ``get``/``set`` API, so
+    tests can pass a local fake instead of a live server.
+    """
+
+    def __init__(self, client: Any, prefix: str = "gymgenius:ai-cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "RedisCacheBackend":
+        """Create a backend connected to the Redis server at url"""
+        try:
+            import redis.asyncio as redis_asyncio  # type: ignore
+        except ImportError as e:
+            raise ValueError(
+                "The redis cache backend requires the 'redis' package"
+            ) from e
+        return cls(redis_asyncio.from_url(url), **kwargs)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            return value.decode()
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        await self.client.set(self.prefix + key, value, ex=ttl_seconds)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it is in flight await the same task and receive its result or
+    exception. The task is shielded, so a cancelled caller (e.g. a client
+    disconnect) does not cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(
+        self, key: str, fn: Callable[[], Awaitable[T]]
+    ) -> Tuple[T, bool]:
+        """Return (result, shared) where shared is True for coalesced
+        callers"""
+        task = self._inflight.get(key)
+        shared = task is not None
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task), shared
+
+    def _on_done(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+class ResponseCache:
+    """Read-through cache in front of AI providers.
+
+    Backend failures are logged and treated as misses so a cache outage
+    never fails a user request.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl_seconds: int = 3600):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.singleflight = SingleFlight()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def get(self, key: str) -> Optional[str]:
+        if self.backend is None:
+            return None
+
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"AI_CACHE_ERROR: Cache read failed | error={str(e)}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        if self.backend is None:
+            return
+
+        try:
+            await self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"AI_CACHE_ERROR: Cache write failed | error={str(e)}")
+
+    async def get_or_generate(
+        self, key: str, generate: Callable[[], Awaitable[str]]
+    ) -> Tuple[str, bool]:
+        """Return (response, served_from_cache), generating on a miss.
+
+        Concurrent misses for the same key share a single generate() call,
+        and every waiter receives its result or AIProviderError.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            return cached, True
+
+        async def generate_and_store() -> str:
+            response = await generate()
+            # Store plain text; provider responses may carry per-call usage
+            await self.set(key, str(response))
+            return response
+
+        response, _ = await self.singleflight.do(key, generate_and_store)
+        return response, False
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "coalesced": self.singleflight.coalesced,
+        }
+
+    async def aclose(self) -> None:
+        if self.backend is not None:
+            await self.backend.aclose()
+
+
+def create_response_cache(
+    backend_type: str,
+    ttl_seconds: int = 3600,
+    max_entries: int = 1024,
+    redis_url: Optional[str] = None,
+) -> ResponseCache:
+    """Factory function to create the response cache.
+
+    Args:
+        backend_type: 'memory', 'redis' or 'none'
+        ttl_seconds: Lifetime of each cached response
+        max_entries: LRU bound for the in-memory backend
+        redis_url: Connection URL for the redis backend
+
+    Raises:
+        ValueError: If backend_type is not supported or misconfigured
+    """
+    backend_type = backend_type.lower().strip()
+
+    if backend_type == "memory":
+        return ResponseCache(InMemoryCacheBackend(max_entries), ttl_seconds)
+    elif backend_type == "redis":
+        if not redis_url:
+            raise ValueError("redis_url is required for the redis cache backend")
+        return ResponseCache(RedisCacheBackend.from_url(redis_url), ttl_seconds)
+    elif backend_type == "none":
+        return ResponseCache(None, ttl_seconds)
+    else:
+        raise ValueError(
+            f"Unknown cache backend: {backend_type}. "
+            f"Supported: 'memory', 'redis', 'none'"
+        )
@@ -1,10 +1,29 @@
 # flake8: noqa
 # pyright: reportMissingImports=false
+import asyncio
+import hashlib
 import logging
+import threading
 import uuid
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Optional
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import google.generativeai as genai  # type: ignore
 import openai  # type: ignore
@@ -13,6 +32,68 @@ import openai  # type: ignore
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+T = TypeVar("T")
+
+
+@dataclass
+class TokenUsage:
+    """Prompt and completion token counts reported by a provider"""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, other: "TokenUsage") -> None:
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+
+
+class AIResponse(str):
+    """Response text that also carries the TokenUsage of its generation.
+
+    Subclasses str so callers that only need the text are unaffected.
+    """
+
+    usage: TokenUsage
+
+    def __new__(cls, text: str, usage: Optional[TokenUsage] = None):
+        response = super().__new__(cls, text)
+        response.usage = usage or TokenUsage()
+        return response
+
+
+# Usage accumulator for the current request; providers add to it so usage
+# of streamed, hedged and coalesced calls is attributed to the caller
+_request_usage: ContextVar[Optional[TokenUsage]] = ContextVar(
+    "ai_request_usage", default=None
+)
+
+
+@contextmanager
+def track_token_usage() -> Iterator[TokenUsage]:
+    """Collect the token usage of every provider call made in this block"""
+    usage = TokenUsage()
+    token = _request_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _request_usage.reset(token)
+
+
+def report_token_usage(usage: TokenUsage) -> None:
+    """Add usage to the accumulator of the enclosing track_token_usage()"""
+    accumulator = _request_usage.get()
+    if accumulator is not None:
+        accumulator.add(usage)
+
+
+def _token_count(value: Any) -> int:
+    """Coerce an SDK token count to int (0 when absent)"""
+    return value if isinstance(value, int) else 0
+
 
 class AIProviderError(Exception):
     """Base exception for AI provider errors"""
@@ -31,6 +112,8 @@ class AIProvider(ABC):
 
     model: str  # Common attribute for all providers
     model_name: str  # Common attribute for all providers
+    # Sampling parameters sent with each request (part of the cache key)
+    generation_params: Dict[str, Any] = {}
 
     @abstractmethod
     async def generate_response(
@@ -39,6 +122,40 @@ class AIProvider(ABC):
         """Generate AI response with error handling and logging"""
         pass
 
+    async def stream_response(
+        self, prompt: str, trace_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Yield the AI response in chunks as they are generated.
+
+        Providers without native streaming fall back to a single chunk
+        holding the complete response.
+        """
+        yield await self.generate_response(prompt, trace_id=trace_id)
+
+    async def generate_batch(
+        self,
+        prompts: Sequence[str],
+        max_concurrency: int = 8,
+        trace_id: Optional[str] = None,
+    ) -> List[Union[str, "AIProviderError"]]:
+        """Generate responses for many prompts with bounded concurrency.
+
+        Results are returned in prompt order; failed items hold their
+        AIProviderError instead of a response.
+        """
+        trace_id = trace_id or str(uuid.uuid4())
+        return await generate_batch(
+            lambda prompt: self.generate_response(prompt, trace_id=trace_id),
+            prompts,
+            max_concurrency,
+            trace_id,
+            getattr(self, "provider_name", type(self).__name__),
+        )
+
+    async def aclose(self) -> None:
+        """Release network resources held by the provider"""
+        return None
+
     def _log_request(self, prompt: str, trace_id: str, provider_name: str) -> None:
         """Log AI request with structured data for debugging"""
         logger.info(
@@ -85,8 +202,12 @@ class OpenAIProvider(AIProvider):
         self.model = model
         self.model_name = model  # Add for consistency with base class
         self.provider_name = "openai"
+        self.generation_params = {"temperature": 0.7, "max_tokens": 2000}
         logger.info(f"OpenAIProvider initialized | model={model}")
 
+    async def aclose(self) -> None:
+        await self.client.close()
+
     async def generate_response(
         self, prompt: str, trace_id: Optional[str] = None
     ) -> str:
@@ -99,8 +220,7 @@ class OpenAIProvider(AIProvider):
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=2000,
+                **self.generation_params,
             )
 
             content = response.choices[0].message.content
@@ -112,34 +232,101 @@ class OpenAIProvider(AIProvider):
                     trace_id,
                 )
 
+            usage = self._usage_from(response)
+            report_token_usage(usage)
+
             duration_ms = (
                 datetime.now(timezone.utc) - start_time
             ).total_seconds() * 1000
             self._log_response(content, trace_id, self.provider_name, duration_ms)
 
-            return content
+            return AIResponse(content, usage)
 
-        except openai.RateLimitError as e:
+        except Exception as e:
             self._log_error(e, trace_id, self.provider_name)
-            raise AIProviderError(
-                f"OpenAI rate limit exceeded: {str(e)}",
-                self.provider_name,
-                "RATE_LIMIT",
-                trace_id,
+            raise self._to_provider_error(e, trace_id)
+
+    async def stream_response(
+        self, prompt: str, trace_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        trace_id = trace_id or str(uuid.uuid4())
+        start_time = datetime.now(timezone.utc)
+        chunks = []
+
+        try:
+            self._log_request(prompt, trace_id, self.provider_name)
+
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                **self.generation_params,
+                stream=True,
+                stream_options={"include_usage": True},
             )
-        except openai.APIError as e:
-            self._log_error(e, trace_id, self.provider_name)
-            raise AIProviderError(
-                f"OpenAI API error: {str(e)}", self.provider_name, "API_ERROR", trace_id
+
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    report_token_usage(self._usage_from(chunk))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+
+            if not chunks:
+                raise AIProviderError(
+                    "Empty response from OpenAI",
+                    self.provider_name,
+                    "EMPTY_RESPONSE",
+                    trace_id,
+                )
+
+            duration_ms = (
+                datetime.now(timezone.utc) - start_time
+            ).total_seconds() * 1000
+            self._log_response(
+                "".join(chunks), trace_id, self.provider_name, duration_ms
             )
+
+        except AIProviderError:
+            raise
         except Exception as e:
             self._log_error(e, trace_id, self.provider_name)
-            raise AIProviderError(
-                f"Unexpected error: {str(e)}",
+            raise self._to_provider_error(e, trace_id)
+
+    @staticmethod
+    def _usage_from(response: Any) -> TokenUsage:
+        usage = getattr(response, "usage", None)
+        return TokenUsage(
+            prompt_tokens=_token_count(getattr(usage, "prompt_tokens", None)),
+            completion_tokens=_token_count(
+                getattr(usage, "completion_tokens", None)
+            ),
+        )
+
+    def _to_provider_error(self, error: Exception, trace_id: str) -> AIProviderError:
+        """Map an OpenAI SDK exception onto AIProviderError"""
+        if isinstance(error, openai.RateLimitError):
+            return AIProviderError(
+                f"OpenAI rate limit exceeded: {str(error)}",
+                self.provider_name,
+                "RATE_LIMIT",
+                trace_id,
+            )
+        if isinstance(error, openai.APIError):
+            return AIProviderError(
+                f"OpenAI API error: {str(error)}",
                 self.provider_name,
-                "UNKNOWN_ERROR",
+                "API_ERROR",
                 trace_id,
             )
+        return AIProviderError(
+            f"Unexpected error: {str(error)}",
+            self.provider_name,
+            "UNKNOWN_ERROR",
+            trace_id,
+        )
 
 
 class GoogleAIProvider(AIProvider):
@@ -174,12 +361,15 @@ class GoogleAIProvider(AIProvider):
                     trace_id,
                 )
 
+            usage = self._usage_from(response)
+            report_token_usage(usage)
+
             duration_ms = (
                 datetime.now(timezone.utc) - start_time
             ).total_seconds() * 1000
             self._log_response(response.text, trace_id, self.provider_name, duration_ms)
 
-            return response.text
+            return AIResponse(response.text, usage)
 
         except Exception as e:
             self._log_error(e, trace_id, self.provider_name)
@@ -187,6 +377,119 @@ class GoogleAIProvider(AIProvider):
                 f"Google AI error: {str(e)}", self.provider_name, "API_ERROR", trace_id
             )
 
+    async def stream_response(
+        self, prompt: str, trace_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        trace_id = trace_id or str(uuid.uuid4())
+        start_time = datetime.now(timezone.utc)
+        chunks = []
+
+        try:
+            self._log_request(prompt, trace_id, self.provider_name)
+
+            response = await self._model_obj.generate_content_async(
+                prompt, stream=True
+            )
+
+            usage = None
+            async for chunk in response:
+                # Each chunk carries cumulative usage; keep the last one
+                if getattr(chunk, "usage_metadata", None) is not None:
+                    usage = self._usage_from(chunk)
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata only)
+                    continue
+                if text:
+                    chunks.append(text)
+                    yield text
+
+            if usage is not None:
+                report_token_usage(usage)
+
+            if not chunks:
+                raise AIProviderError(
+                    "Empty response from Google AI",
+                    self.provider_name,
+                    "EMPTY_RESPONSE",
+                    trace_id,
+                )
+
+            duration_ms = (
+                datetime.now(timezone.utc) - start_time
+            ).total_seconds() * 1000
+            self._log_response(
+                "".join(chunks), trace_id, self.provider_name, duration_ms
+            )
+
+        except AIProviderError:
+            raise
+        except Exception as e:
+            self._log_error(e, trace_id, self.provider_name)
+            raise AIProviderError(
+                f"Google AI error: {str(e)}", self.provider_name, "API_ERROR", trace_id
+            )
+
+    @staticmethod
+    def _usage_from(response: Any) -> TokenUsage:
+        metadata = getattr(response, "usage_metadata", None)
+        return TokenUsage(
+            prompt_tokens=_token_count(
+                getattr(metadata, "prompt_token_count", None)
+            ),
+            completion_tokens=_token_count(
+                getattr(metadata, "candidates_token_count", None)
+            ),
+        )
+
+
+async def generate_batch(
+    generate: Callable[[str], Awaitable[T]],
+    prompts: Sequence[str],
+    max_concurrency: int,
+    trace_id: str,
+    provider_name: str = "unknown",
+) -> List[Union[T, AIProviderError]]:
+    """Run generate() over prompts with at most max_concurrency in flight.
+
+    Results keep prompt order. AIProviderErrors are returned in place of
+    the failed item; other exceptions are wrapped as UNKNOWN_ERROR so one
+    bad item never fails the whole batch.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(prompt: str) -> Union[T, AIProviderError]:
+        async with semaphore:
+            try:
+                return await generate(prompt)
+            except AIProviderError as e:
+                return e
+            except Exception as e:
+                logger.error(
+                    f"AI_BATCH_ITEM_ERROR: {type(e).__name__} | "
+                    f"error={str(e)} | "
+                    f"trace_id={trace_id}",
+                    exc_info=True,
+                )
+                return AIProviderError(
+                    f"Unexpected error: {str(e)}",
+                    provider_name,
+                    "UNKNOWN_ERROR",
+                    trace_id,
+                )
+
+    logger.info(
+        f"AI_BATCH_REQUEST: Generating batch | "
+        f"size={len(prompts)} | "
+        f"max_concurrency={max_concurrency} | "
+        f"trace_id={trace_id}"
+    )
+    return await asyncio.gather(*[run(prompt) for prompt in prompts])
+
 
 def create_ai_provider(
     provider_type: str, api_key: str, model: Optional[str] = None
@@ -226,3 +529,81 @@ def create_ai_provider(
         raise ValueError(
             f"Unknown provider type: {provider_type}. Supported: 'openai', 'google'"
         )
+
+
+
+def _fingerprint_api_key(api_key: str) -> str:
+    """Return a short, non-reversible fingerprint of an API key"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class AIProviderPool:
+    """Registry of long-lived AI providers shared across requests.
+
+    Providers are keyed by (provider_type, model, api key fingerprint) so
+    each SDK client and its connection pool is built once and reused until
+    the pool is closed, typically at application shutdown.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str, str, Optional[str]], AIProvider] = (
+            create_ai_provider
+        ),
+    ):
+        self._factory = factory
+        self._providers: Dict[Tuple[str, str, str], AIProvider] = {}
+        # Sync FastAPI dependencies run in a threadpool
+        self._lock = threading.Lock()
+
+    def get(
+        self, provider_type: str, api_key: str, model: Optional[str] = None
+    ) -> AIProvider:
+        """Return the pooled provider for this configuration, creating it
+        on first use.
+
+        Raises:
+            ValueError: If provider_type is not supported
+        """
+        key = (
+            provider_type.lower().strip(),
+            model or "",
+            _fingerprint_api_key(api_key),
+        )
+        provider = self._providers.get(key)
+        if provider is not None:
+            return provider
+
+        with self._lock:
+            provider = self._providers.get(key)
+            if provider is None:
+                provider = self._factory(provider_type, api_key, model)
+                self._providers[key] = provider
+                logger.info(
+                    f"AI_PROVIDER_POOL: Provider created | "
+                    f"provider_type={key[0]} | "
+                    f"model={model or 'default'} | "
+                    f"pool_size={len(self._providers)}"
+                )
+        return provider
+
+    def __len__(self) -> int:
+        return len(self._providers)
+
+    async def aclose(self) -> None:
+        """Close every pooled provider and empty the registry"""
+        with self._lock:
+            providers = list(self._providers.values())
+            self._providers.clear()
+
+        for provider in providers:
+            close = getattr(provider, "aclose", None)
+            if close is None:
+                continue
+            try:
+                await close()
+            except Exception as e:
+                logger.warning(
+                    f"AI_PROVIDER_POOL: Failed to close provider | "
+                    f"error={str(e)}"
+                )
@@ -0,0 +1,466 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+"""
+AI Provider Resilience for GymGenius
+====================================
+
+Wrappers that keep the backend responsive when an AI provider slows down
+or fails.
+
+**Features:**
+- Per-provider concurrency bulkhead with a bounded wait queue and queue
+  timeout; overflow is rejected immediately as ``AIProviderError`` so the
+  endpoints answer with their empathetic 503 payload
+- In-flight, queued and rejected gauges per provider
+- Circuit breaker per provider tracking error rate and latency, with
+  half-open probing to recover
+- Failover across configured providers, with optional hedged requests
+  fired after the primary's observed p95 latency
+"""
+
+import asyncio
+import logging
+import math
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from ai_provider import AIProvider, AIProviderError
+
+logger = logging.getLogger(__name__)
+
+
+class Bulkhead:
+    """Concurrency limit with a bounded wait queue for one provider"""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int = 32,
+        max_queue: int = 64,
+        queue_timeout: float = 5.0,
+    ):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        if max_queue < 0:
+            raise ValueError("max_queue cannot be negative")
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def acquire(self, trace_id: str) -> AsyncIterator[None]:
+        """Hold one concurrency slot for the duration of the block.
+
+        Raises:
+            AIProviderError: CAPACITY_EXCEEDED when the wait queue is full,
+                QUEUE_TIMEOUT when no slot frees up within queue_timeout
+        """
+        if self._semaphore.locked():
+            if self.queued >= self.max_queue:
+                self._reject("CAPACITY_EXCEEDED", trace_id)
+
+            self.queued += 1
+            try:
+                await asyncio.wait_for(
+                    self._semaphore.acquire(), timeout=self.queue_timeout
+                )
+            except asyncio.TimeoutError:
+                self._reject("QUEUE_TIMEOUT", trace_id)
+            finally:
+                self.queued -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _reject(self, error_type: str, trace_id: str) -> None:
+        self.rejected += 1
+        logger.warning(
+            f"AI_BULKHEAD_REJECTED: Provider at capacity | "
+            f"provider={self.name} | "
+            f"reason={error_type} | "
+            f"in_flight={self.in_flight} | "
+            f"queued={self.queued} | "
+            f"trace_id={trace_id}"
+        )
+        raise AIProviderError(
+            f"Provider {self.name} is at capacity",
+            self.name,
+            error_type,
+            trace_id,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+
+class BulkheadProvider(AIProvider):
+    """AIProvider wrapper that runs every call inside a Bulkhead"""
+
+    def __init__(self, provider: AIProvider, bulkhead: Bulkhead):
+        self.provider = provider
+        self.bulkhead = bulkhead
+        self.model = provider.model
+        self.model_name = getattr(provider, "model_name", provider.model)
+        self.provider_name = getattr(provider, "provider_name", bulkhead.name)
+        self.generation_params = getattr(provider, "generation_params", {})
+
+    async def generate_response(
+        self, prompt: str, trace_id: Optional[str] = None
+    ) -> str:
+        trace_id = trace_id or str(uuid.uuid4())
+        async with self.bulkhead.acquire(trace_id):
+            return await self.provider.generate_response(prompt, trace_id=trace_id)
+
+    async def stream_response(
+        self, prompt: str, trace_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        trace_id = trace_id or str(uuid.uuid4())
+        async with self.bulkhead.acquire(trace_id):
+            async for chunk in self.provider.stream_response(
+                prompt, trace_id=trace_id
+            ):
+                yield chunk
+
+    async def aclose(self) -> None:
+        close = getattr(self.provider, "aclose", None)
+        if close is not None:
+            await close()
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker for one provider.
+
+    Outcomes of the last ``window_size`` calls are tracked; calls slower
+    than ``slow_call_ms`` count as failures. Once at least
+    ``min_calls`` outcomes are recorded and the failure rate reaches
+    ``failure_rate_threshold`` the circuit opens and calls are refused for
+    ``open_seconds``. After that a single half-open probe is let through:
+    success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+        slow_call_ms: Optional[float] = None,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.slow_call_ms = slow_call_ms
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)
+        self._latencies_ms: Deque[float] = deque(maxlen=window_size * 5)
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be sent to this provider now"""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self, latency_ms: float) -> None:
+        self._latencies_ms.append(latency_ms)
+        if self.slow_call_ms is not None and latency_ms > self.slow_call_ms:
+            self._record(False)
+        else:
+            self._record(True)
+
+    def record_failure(self, latency_ms: float) -> None:
+        self._latencies_ms.append(latency_ms)
+        self._record(False)
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe whose call was abandoned"""
+        self._probe_in_flight = False
+
+    def _record(self, ok: bool) -> None:
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+            if ok:
+                self._close()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(ok)
+        if self.state == self.CLOSED and self._should_open():
+            self._open()
+
+    def _should_open(self) -> bool:
+        if len(self._outcomes) < self.min_calls:
+            return False
+        failures = self._outcomes.count(False)
+        return failures / len(self._outcomes) >= self.failure_rate_threshold
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        logger.warning(
+            f"AI_CIRCUIT_OPEN: Provider circuit opened | "
+            f"provider={self.name} | "
+            f"open_seconds={self.open_seconds}"
+        )
+
+    def _close(self) -> None:
+        self.state = self.CLOSED
+        self._outcomes.clear()
+        logger.info(f"AI_CIRCUIT_CLOSED: Provider recovered | provider={self.name}")
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Return the observed latency percentile in ms, or None without
+        enough samples"""
+        if len(self._latencies_ms) < self.min_calls:
+            return None
+        ordered = sorted(self._latencies_ms)
+        index = max(0, math.ceil(percentile * len(ordered)) - 1)
+        return ordered[index]
+
+    def stats(self) -> Dict[str, Any]:
+        total = len(self._outcomes)
+        failures = self._outcomes.count(False)
+        return {
+            "state": self.state,
+            "failure_rate": (failures / total) if total else 0.0,
+            "times_opened": self.times_opened,
+            "p95_latency_ms": self.latency_percentile(0.95),
+        }
+
+
+class FailoverProvider(AIProvider):
+    """Composite AIProvider that fails over between backends.
+
+    Backends are tried in priority order, skipping those whose circuit is
+    open. With ``hedge_percentile`` set, a call still pending after that
+    percentile of the backend's observed latency is also sent to the next
+    healthy backend, and the first successful answer wins.
+    """
+
+    def __init__(
+        self,
+        backends: List[Tuple[AIProvider, CircuitBreaker]],
+        hedge_percentile: Optional[float] = None,
+    ):
+        if not backends:
+            raise ValueError("At least one backend is required")
+        self.backends = backends
+        self.hedge_percentile = hedge_percentile
+        primary = backends[0][0]
+        self.model = primary.model
+        self.model_name = getattr(primary, "model_name", primary.model)
+        self.provider_name = getattr(primary, "provider_name", backends[0][1].name)
+        self.generation_params = getattr(primary, "generation_params", {})
+
+    async def generate_response(
+        self, prompt: str, trace_id: Optional[str] = None
+    ) -> str:
+        trace_id = trace_id or str(uuid.uuid4())
+        queue = list(self.backends)
+        last_error: Optional[AIProviderError] = None
+
+        while queue:
+            provider, breaker = queue.pop(0)
+            if not breaker.allow_request():
+                continue
+
+            call = asyncio.ensure_future(
+                self._call(provider, breaker, prompt, trace_id)
+            )
+            hedge_delay = self._hedge_delay(breaker) if queue else None
+            try:
+                return await self._race(call, queue, hedge_delay, prompt, trace_id)
+            except AIProviderError as e:
+                last_error = e
+                self._log_failover(breaker.name, e)
+
+        raise last_error or self._all_open_error(trace_id)
+
+    async def stream_response(
+        self, prompt: str, trace_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream from the first healthy backend.
+
+        Failover only happens before the first chunk is produced; once
+        text has reached the client, later errors propagate.
+        """
+        trace_id = trace_id or str(uuid.uuid4())
+        last_error: Optional[AIProviderError] = None
+
+        for provider, breaker in self.backends:
+            if not breaker.allow_request():
+                continue
+
+            start = time.monotonic()
+            stream = provider.stream_response(prompt, trace_id=trace_id)
+            try:
+                try:
+                    first_chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    breaker.record_success(_elapsed_ms(start))
+                    return
+                except AIProviderError as e:
+                    breaker.record_failure(_elapsed_ms(start))
+                    last_error = e
+                    self._log_failover(breaker.name, e)
+                    continue
+
+                yield first_chunk
+                async for chunk in stream:
+                    yield chunk
+            except AIProviderError:
+                breaker.record_failure(_elapsed_ms(start))
+                raise
+            except BaseException:
+                breaker.release_probe()
+                raise
+            finally:
+                await stream.aclose()
+
+            breaker.record_success(_elapsed_ms(start))
+            return
+
+        raise last_error or self._all_open_error(trace_id)
+
+    async def _call(
+        self,
+        provider: AIProvider,
+        breaker: CircuitBreaker,
+        prompt: str,
+        trace_id: str,
+    ) -> str:
+        start = time.monotonic()
+        try:
+            response = await provider.generate_response(prompt, trace_id=trace_id)
+        except AIProviderError:
+            breaker.record_failure(_elapsed_ms(start))
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+        breaker.record_success(_elapsed_ms(start))
+        return response
+
+    async def _race(
+        self,
+        call: "asyncio.Future[str]",
+        queue: List[Tuple[AIProvider, CircuitBreaker]],
+        hedge_delay: Optional[float],
+        prompt: str,
+        trace_id: str,
+    ) -> str:
+        """Await call, hedging to the next healthy backend in queue (which
+        is consumed) if it is still pending after hedge_delay seconds"""
+        pending = {call}
+        try:
+            if hedge_delay is not None:
+                done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+                if done:
+                    pending = done
+                else:
+                    hedge = self._next_available(queue)
+                    if hedge is not None:
+                        logger.info(
+                            f"AI_HEDGE: Sending hedged request | "
+                            f"provider={hedge[1].name} | "
+                            f"delay_ms={hedge_delay * 1000:.2f} | "
+                            f"trace_id={trace_id}"
+                        )
+                        pending.add(
+                            asyncio.ensure_future(
+                                self._call(*hedge, prompt, trace_id)
+                            )
+                        )
+
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    last_error = error
+            assert last_error is not None
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _next_available(
+        self, queue: List[Tuple[AIProvider, CircuitBreaker]]
+    ) -> Optional[Tuple[AIProvider, CircuitBreaker]]:
+        while queue:
+            provider, breaker = queue.pop(0)
+            if breaker.allow_request():
+                return provider, breaker
+        return None
+
+    def _hedge_delay(self, breaker: CircuitBreaker) -> Optional[float]:
+        if self.hedge_percentile is None:
+            return None
+        latency_ms = breaker.latency_percentile(self.hedge_percentile)
+        return latency_ms / 1000 if latency_ms is not None else None
+
+    def _all_open_error(self, trace_id: str) -> AIProviderError:
+        names = ",".join(breaker.name for _, breaker in self.backends)
+        return AIProviderError(
+            "All AI provider circuits are open", names, "CIRCUIT_OPEN", trace_id
+        )
+
+    def _log_failover(self, provider_name: str, error: AIProviderError) -> None:
+        logger.warning(
+            f"AI_FAILOVER: Provider call failed | "
+            f"provider={provider_name} | "
+            f"error_type={error.error_type} | "
+            f"trace_id={error.trace_id}"
+        )
+
+    async def aclose(self) -> None:
+        # Backends are owned by the provider pool
+        return None
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.monotonic() - start) * 1000
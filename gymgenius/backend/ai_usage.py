@@ -0,0 +1,184 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+"""
+AI Token Usage Ledger for GymGenius
+===================================
+
+Tracks who drives AI spend and caps it.
+
+**Features:**
+- Per-user, per-model token counters kept in memory (a dict update per
+  request) and flushed periodically to a pluggable store
+- Daily token budgets per user, checked before the provider is called
+- JSON-lines file store and a log store for environments without a path
+
+Budgets are tracked per process; with several workers each enforces the
+configured budget against the usage it has seen.
+"""
+
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai_provider import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS_USER = "anonymous"
+
+
+class BudgetExceededError(Exception):
+    """Raised when a user has spent their daily token budget"""
+
+    def __init__(self, user_id: str, budget: int, used: int, trace_id: str):
+        self.user_id = user_id
+        self.budget = budget
+        self.used = used
+        self.trace_id = trace_id
+        super().__init__(
+            f"Daily token budget exhausted for user {user_id}: {used}/{budget}"
+        )
+
+
+class UsageStore(ABC):
+    """Abstract destination for flushed usage records"""
+
+    @abstractmethod
+    async def write(self, records: List[Dict[str, Any]]) -> None:
+        """Persist a batch of aggregated usage records"""
+        pass
+
+
+class LogUsageStore(UsageStore):
+    """Writes usage records to the application log"""
+
+    async def write(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            logger.info(f"AI_USAGE: {json.dumps(record, sort_keys=True)}")
+
+
+class JsonlUsageStore(UsageStore):
+    """Appends usage records to a JSON-lines file off the event loop"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def write(self, records: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(record, sort_keys=True) + "\n" for record in records)
+        await asyncio.to_thread(self._append, lines)
+
+    def _append(self, lines: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class UsageLedger:
+    """In-memory token usage counters with daily budget enforcement"""
+
+    def __init__(self, store: UsageStore, daily_token_budget: int = 0):
+        self.store = store
+        self.daily_token_budget = daily_token_budget
+        # (day, user_id, model) -> [requests, prompt_tokens, completion_tokens]
+        self._pending: Dict[Tuple[str, str, str], List[int]] = {}
+        self._day = _today()
+        self._daily_totals: Dict[str, int] = {}
+
+    def _roll_day(self) -> None:
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self._daily_totals.clear()
+
+    def record(
+        self, user_id: Optional[str], model: str, usage: TokenUsage
+    ) -> None:
+        """Add one request's usage to the counters"""
+        self._roll_day()
+        user_id = user_id or ANONYMOUS_USER
+        counters = self._pending.setdefault((self._day, user_id, model), [0, 0, 0])
+        counters[0] += 1
+        counters[1] += usage.prompt_tokens
+        counters[2] += usage.completion_tokens
+        self._daily_totals[user_id] = (
+            self._daily_totals.get(user_id, 0) + usage.total_tokens
+        )
+
+    def tokens_used_today(self, user_id: Optional[str]) -> int:
+        self._roll_day()
+        return self._daily_totals.get(user_id or ANONYMOUS_USER, 0)
+
+    def check_budget(self, user_id: Optional[str], trace_id: str) -> None:
+        """Raise BudgetExceededError if user_id has no budget left today.
+
+        Requests without a user_id are recorded but not budgeted; they are
+        covered by the per-IP rate limits instead.
+        """
+        if not self.daily_token_budget or not user_id:
+            return
+
+        used = self.tokens_used_today(user_id)
+        if used >= self.daily_token_budget:
+            logger.warning(
+                f"AI_BUDGET_EXCEEDED: Daily token budget exhausted | "
+                f"user_id={user_id} | "
+                f"used={used} | "
+                f"budget={self.daily_token_budget} | "
+                f"trace_id={trace_id}"
+            )
+            raise BudgetExceededError(
+                user_id, self.daily_token_budget, used, trace_id
+            )
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return unflushed counters as records"""
+        return [
+            {
+                "day": day,
+                "user_id": user_id,
+                "model": model,
+                "requests": requests,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+            }
+            for (day, user_id, model), (
+                requests,
+                prompt_tokens,
+                completion_tokens,
+            ) in self._pending.items()
+        ]
+
+    async def flush(self) -> int:
+        """Write pending counters to the store; returns records written.
+
+        Counters are swapped out before the write so requests keep
+        recording while it is in progress. On failure they are merged back
+        and retried on the next flush.
+        """
+        if not self._pending:
+            return 0
+
+        records = self.snapshot()
+        pending, self._pending = self._pending, {}
+        try:
+            await self.store.write(records)
+        except Exception as e:
+            logger.error(f"AI_USAGE_FLUSH_ERROR: {str(e)}", exc_info=True)
+            for key, counters in pending.items():
+                merged = self._pending.setdefault(key, [0, 0, 0])
+                for i, value in enumerate(counters):
+                    merged[i] += value
+            return 0
+        return len(records)
+
+    async def run_periodic_flush(self, interval_seconds: float) -> None:
+        """Flush forever every interval_seconds (run as a background task)"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await self.flush()
@@ -0,0 +1,78 @@
+"""
+Singleflight Concurrency Benchmark
+==================================
+
+Simulates a push-notification burst: many users send the same suggested
+prompt at once. Compares provider calls and wall time with and without
+request coalescing in ResponseCache.
+
+Usage (from gymgenius/backend):
+    python -m benchmarks.bench_singleflight --concurrency 500 --latency-ms 800
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from ai_cache import ResponseCache, SingleFlight, build_cache_key
+
+
+class SlowProvider:
+    """Stand-in provider with fixed latency that counts its calls"""
+
+    def __init__(self, latency_ms: float):
+        self.latency_s = latency_ms / 1000
+        self.calls = 0
+
+    async def generate_response(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency_s)
+        return f"plan for: {prompt}"
+
+
+class _NoCoalescing(SingleFlight):
+    async def do(self, key, fn):
+        return await fn(), False
+
+
+async def _burst(coalesce: bool, concurrency: int, latency_ms: float) -> dict:
+    provider = SlowProvider(latency_ms)
+    cache = ResponseCache(None)
+    if not coalesce:
+        cache.singleflight = _NoCoalescing()
+
+    prompt = "Give me a 3-day beginner split"
+    key = build_cache_key(prompt, "fake", "bench")
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[
+            cache.get_or_generate(key, lambda: provider.generate_response(prompt))
+            for _ in range(concurrency)
+        ]
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "coalescing": coalesce,
+        "concurrency": concurrency,
+        "provider_calls": provider.calls,
+        "wall_ms": round(elapsed_ms, 2),
+    }
+
+
+async def main(concurrency: int, latency_ms: float) -> None:
+    results = [
+        await _burst(False, concurrency, latency_ms),
+        await _burst(True, concurrency, latency_ms),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.latency_ms))
@@ -1,15 +1,39 @@
+import asyncio
+import hmac
 import html
+import json
 import logging
 import os
 import re
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
-
-from ai_provider import AIProvider, AIProviderError, create_ai_provider
-from fastapi import Body, Depends, FastAPI, HTTPException, Request, status
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from ai_cache import ResponseCache, build_cache_key, create_response_cache
+from ai_provider import (
+    AIProvider,
+    AIProviderError,
+    AIProviderPool,
+    create_ai_provider,
+    generate_batch,
+    track_token_usage,
+)
+from ai_resilience import (
+    Bulkhead,
+    BulkheadProvider,
+    CircuitBreaker,
+    FailoverProvider,
+)
+from ai_usage import (
+    BudgetExceededError,
+    JsonlUsageStore,
+    LogUsageStore,
+    UsageLedger,
+)
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, validator
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
@@ -25,12 +49,80 @@ logger = logging.getLogger(__name__)
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
 
+
+
+def _provider_setting(provider_type: str, name: str, default: str) -> str:
+    """Read AI_<PROVIDER>_<NAME>, falling back to AI_<NAME> then default"""
+    return os.getenv(
+        f"AI_{provider_type.upper()}_{name}", os.getenv(f"AI_{name}", default)
+    )
+
+
+def _get_bulkhead(provider_type: str) -> Bulkhead:
+    """Return the concurrency bulkhead shared by all providers of a type"""
+    bulkheads: Dict[str, Bulkhead] = app.state.bulkheads
+    if provider_type not in bulkheads:
+        bulkheads[provider_type] = Bulkhead(
+            provider_type,
+            max_concurrent=int(
+                _provider_setting(provider_type, "MAX_CONCURRENCY", "32")
+            ),
+            max_queue=int(_provider_setting(provider_type, "MAX_QUEUE", "64")),
+            queue_timeout=float(
+                _provider_setting(provider_type, "QUEUE_TIMEOUT_SECONDS", "5")
+            ),
+        )
+    return bulkheads[provider_type]
+
+
+def _build_provider(
+    provider_type: str, api_key: str, model: Optional[str] = None
+) -> AIProvider:
+    """Provider factory used by the pool (resolved at call time)"""
+    provider = create_ai_provider(provider_type, api_key, model)
+    return BulkheadProvider(provider, _get_bulkhead(provider_type.lower().strip()))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator:
+    """Create long-lived AI providers on startup and close them on shutdown"""
+    app.state.bulkheads = {}
+    app.state.circuit_breakers = {}
+    app.state.provider_pool = AIProviderPool(_build_provider)
+    app.state.response_cache = create_response_cache(
+        os.getenv("AI_CACHE_BACKEND", "memory"),
+        ttl_seconds=int(os.getenv("AI_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024")),
+        redis_url=os.getenv("AI_CACHE_REDIS_URL"),
+    )
+    usage_store_path = os.getenv("AI_USAGE_STORE_PATH")
+    app.state.usage_ledger = UsageLedger(
+        JsonlUsageStore(usage_store_path) if usage_store_path else LogUsageStore(),
+        daily_token_budget=int(os.getenv("AI_DAILY_TOKEN_BUDGET", "0")),
+    )
+    usage_flush_task = asyncio.create_task(
+        app.state.usage_ledger.run_periodic_flush(
+            float(os.getenv("AI_USAGE_FLUSH_SECONDS", "60"))
+        )
+    )
+    yield
+    usage_flush_task.cancel()
+    try:
+        await usage_flush_task
+    except asyncio.CancelledError:
+        pass
+    await app.state.usage_ledger.flush()
+    await app.state.provider_pool.aclose()
+    await app.state.response_cache.aclose()
+
+
 # Initialize FastAPI app with security headers
 app = FastAPI(
     title="GymGenius Backend",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Add rate limiter to app
@@ -106,6 +198,27 @@ class GenerateRequest(BaseModel):
         return v
 
 
+class GenerateBatchRequest(BaseModel):
+    """Request model for /generate/batch endpoint"""
+
+    prompts: List[str] = Field(..., min_length=1, max_length=100)
+    provider_type: str = Field(default="google", pattern="^(google|openai)$")
+    model: Optional[str] = Field(default=None, max_length=100)
+    max_concurrency: int = Field(default=8, ge=1, le=32)
+
+    @validator("prompts", each_item=True)
+    def sanitize_prompts(cls, v):
+        if not v or len(v) > 5000:
+            raise ValueError("each prompt must be 1-5000 characters")
+        return InputSanitizer.sanitize_text(v)
+
+    @validator("model")
+    def sanitize_model(cls, v):
+        if v:
+            return InputSanitizer.sanitize_text(v, max_length=100)
+        return v
+
+
 class ChatRequest(BaseModel):
     """Request model for /api/chat endpoint"""
 
@@ -131,18 +244,23 @@ def get_generate_request(
     return generate_request
 
 
-def get_ai_provider(
-    generate_request: GenerateRequest = Depends(get_generate_request),
+def get_provider_pool(request: Request) -> AIProviderPool:
+    """Dependency returning the application-wide AI provider pool"""
+    return request.app.state.provider_pool
+
+
+def _get_pooled_provider(
+    pool: AIProviderPool, provider_type: str, model: Optional[str]
 ) -> AIProvider:
-    """Dependency injection factory for AI provider.
+    """Return the pooled provider for an explicitly requested provider type.
 
-    Reads configuration from environment variables and creates
-    the appropriate provider instance.
+    Raises HTTPException when the API key is missing or the provider type
+    is not supported.
     """
     trace_id = str(uuid.uuid4())
 
     # Secure secrets management - load from environment only
-    provider_type = generate_request.provider_type.lower()
+    provider_type = provider_type.lower()
     api_key = None
 
     if provider_type == "openai":
@@ -172,9 +290,7 @@ def get_ai_provider(
         )
 
     try:
-        return create_ai_provider(
-            provider_type, api_key, generate_request.model
-        )
+        return pool.get(provider_type, api_key, model)
     except ValueError as e:
         logger.error(
             f"PROVIDER_CREATION_ERROR: {str(e)} | "
@@ -191,6 +307,58 @@ def get_ai_provider(
         )
 
 
+def get_ai_provider(
+    generate_request: GenerateRequest = Depends(get_generate_request),
+    pool: AIProviderPool = Depends(get_provider_pool),
+) -> AIProvider:
+    """Dependency injection factory for AI provider.
+
+    Reads configuration from environment variables and returns the
+    pooled provider instance for it.
+    """
+    return _get_pooled_provider(
+        pool, generate_request.provider_type, generate_request.model
+    )
+
+
+def get_generate_batch_request(
+    batch_request: GenerateBatchRequest = Body(...),
+):
+    """Dependency helper to bind GenerateBatchRequest to request body"""
+    return batch_request
+
+
+def get_batch_ai_provider(
+    batch_request: GenerateBatchRequest = Depends(get_generate_batch_request),
+    pool: AIProviderPool = Depends(get_provider_pool),
+) -> AIProvider:
+    """Dependency injection factory for the batch endpoint's AI provider"""
+    return _get_pooled_provider(
+        pool, batch_request.provider_type, batch_request.model
+    )
+
+
+def require_service_api_key(
+    x_api_key: Optional[str] = Header(default=None),
+) -> None:
+    """Authenticate service-to-service callers via the X-API-Key header.
+
+    The expected key is read from BATCH_API_KEY; when it is not configured
+    every request is rejected.
+    """
+    expected = os.getenv("BATCH_API_KEY")
+    if not expected or not x_api_key or not hmac.compare_digest(
+        x_api_key.encode(), expected.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "error": "unauthorized",
+                "message": "A valid X-API-Key header is required",
+            },
+        )
+
+
 # Global Exception Handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -255,6 +423,172 @@ async def health_check():
     }
 
 
+def _get_chat_provider(
+    request: Request, trace_id: str
+) -> Tuple[str, AIProvider]:
+    """Resolve the chat provider configured via AI_PROVIDER.
+
+    The primary provider is combined with the optional AI_FALLBACK_PROVIDER
+    behind per-provider circuit breakers. Returns (provider_type, provider)
+    where provider_type names the primary.
+    """
+    provider_type = os.getenv("AI_PROVIDER", "google")
+    fallback_type = os.getenv("AI_FALLBACK_PROVIDER")
+    pool = get_provider_pool(request)
+
+    backends = []
+    for candidate in (provider_type, fallback_type):
+        if not candidate or any(b.name == candidate for _, b in backends):
+            continue
+        api_key = _chat_api_key(candidate)
+        if api_key:
+            backends.append(
+                (pool.get(candidate, api_key), _get_circuit_breaker(candidate))
+            )
+
+    if not backends:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": "configuration_error",
+                "user_message": (
+                    "I'm having trouble connecting right now. "
+                    "Please try again in a moment!"
+                ),
+                "trace_id": trace_id,
+            },
+        )
+
+    hedge_percentile = os.getenv("AI_HEDGE_PERCENTILE")
+    return provider_type, FailoverProvider(
+        backends,
+        hedge_percentile=float(hedge_percentile) if hedge_percentile else None,
+    )
+
+
+def _chat_api_key(provider_type: str) -> Optional[str]:
+    return (
+        os.getenv("OPENAI_API_KEY")
+        if provider_type == "openai"
+        else os.getenv("GOOGLE_API_KEY")
+    )
+
+
+def _get_circuit_breaker(provider_type: str) -> CircuitBreaker:
+    """Return the long-lived circuit breaker for a provider type"""
+    breakers: Dict[str, CircuitBreaker] = app.state.circuit_breakers
+    if provider_type not in breakers:
+        slow_call_ms = _provider_setting(provider_type, "CIRCUIT_SLOW_CALL_MS", "")
+        breakers[provider_type] = CircuitBreaker(
+            provider_type,
+            failure_rate_threshold=float(
+                _provider_setting(provider_type, "CIRCUIT_FAILURE_RATE", "0.5")
+            ),
+            window_size=int(
+                _provider_setting(provider_type, "CIRCUIT_WINDOW", "20")
+            ),
+            min_calls=int(
+                _provider_setting(provider_type, "CIRCUIT_MIN_CALLS", "5")
+            ),
+            open_seconds=float(
+                _provider_setting(provider_type, "CIRCUIT_OPEN_SECONDS", "30")
+            ),
+            slow_call_ms=float(slow_call_ms) if slow_call_ms else None,
+        )
+    return breakers[provider_type]
+
+
+async def _generate_cached(
+    request: Request,
+    provider: AIProvider,
+    provider_type: str,
+    prompt: str,
+    trace_id: str,
+    user_id: Optional[str] = None,
+) -> Tuple[str, bool, int]:
+    """Generate a response through the response cache.
+
+    Checks the caller's daily token budget first and records the tokens
+    the provider call spent. Cache hits and coalesced waiters spend none.
+
+    Returns (response_text, served_from_cache, tokens_used).
+    """
+    ledger: UsageLedger = request.app.state.usage_ledger
+    ledger.check_budget(user_id, trace_id)
+
+    cache: ResponseCache = request.app.state.response_cache
+    key = build_cache_key(
+        prompt,
+        provider_type,
+        provider.model,
+        getattr(provider, "generation_params", None),
+    )
+    with track_token_usage() as usage:
+        try:
+            response, cached = await cache.get_or_generate(
+                key, lambda: provider.generate_response(prompt, trace_id=trace_id)
+            )
+        finally:
+            if usage.total_tokens:
+                ledger.record(user_id, provider.model, usage)
+    return str(response), cached, usage.total_tokens
+
+
+def _budget_exceeded_detail(e: BudgetExceededError) -> Dict[str, Any]:
+    return {
+        "error": "token_budget_exceeded",
+        "message": str(e),
+        "trace_id": e.trace_id,
+    }
+
+
+def _chat_error_payload(e: AIProviderError) -> Dict[str, Any]:
+    """Log a chat provider failure and build its empathetic payload"""
+    logger.error(
+        f"CHAT_AI_ERROR: {e.message} | "
+        f"provider={e.provider} | "
+        f"error_type={e.error_type} | "
+        f"trace_id={e.trace_id}"
+    )
+
+    # Empathetic error message
+    user_message = (
+        "I'm taking a bit longer than usual to respond. "
+        "This sometimes happens when I'm thinking really hard! "
+        "Could you try asking again?"
+    )
+
+    if e.error_type == "RATE_LIMIT":
+        user_message = (
+            "Whoa, you're on fire with questions! Give me just a "
+            "moment to catch up, then we can continue. 😊"
+        )
+
+    return {
+        "error": e.error_type.lower(),
+        "user_message": user_message,
+        "trace_id": e.trace_id,
+    }
+
+
+def _chat_budget_payload(e: BudgetExceededError) -> Dict[str, Any]:
+    """Build the empathetic payload for an exhausted daily token budget"""
+    return {
+        "error": "token_budget_exceeded",
+        "user_message": (
+            "We've covered a lot of ground today! I need to recharge, "
+            "so let's pick this up again tomorrow. 💪"
+        ),
+        "trace_id": e.trace_id,
+    }
+
+
+def _sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Encode a server-sent event frame"""
+    frame = f"event: {event}\n" if event else ""
+    return f"{frame}data: {json.dumps(data)}\n\n"
+
+
 # AI Chat Endpoint (User-Facing)
 @app.post("/api/chat", tags=["AI"])
 @limiter.limit("20/minute")  # Rate limiting
@@ -274,77 +608,105 @@ async def chat(request: Request, chat_request: ChatRequest):
     )
 
     try:
-        # Get AI provider from environment
-        provider_type = os.getenv("AI_PROVIDER", "google")
-        api_key = (
-            os.getenv("OPENAI_API_KEY")
-            if provider_type == "openai"
-            else os.getenv("GOOGLE_API_KEY")
-        )
-
-        if not api_key:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail={
-                    "error": "configuration_error",
-                    "user_message": (
-                        "I'm having trouble connecting right now. "
-                        "Please try again in a moment!"
-                    ),
-                    "trace_id": trace_id,
-                },
-            )
-
-        provider = create_ai_provider(provider_type, api_key)
+        provider_type, provider = _get_chat_provider(request, trace_id)
 
         # Generate response
-        response_text = await provider.generate_response(
-            chat_request.message, trace_id=trace_id
+        response_text, cached, tokens_used = await _generate_cached(
+            request,
+            provider,
+            provider_type,
+            chat_request.message,
+            trace_id,
+            chat_request.user_id,
         )
 
         return {
             "response": response_text,
+            "cached": cached,
+            "tokens_used": tokens_used,
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "trace_id": trace_id,
         }
 
     except AIProviderError as e:
-        logger.error(
-            f"CHAT_AI_ERROR: {e.message} | "
-            f"provider={e.provider} | "
-            f"error_type={e.error_type} | "
-            f"trace_id={e.trace_id}"
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=_chat_error_payload(e),
         )
-
-        # Empathetic error message
-        user_message = (
-            "I'm taking a bit longer than usual to respond. "
-            "This sometimes happens when I'm thinking really hard! "
-            "Could you try asking again?"
+    except BudgetExceededError as e:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content=_chat_budget_payload(e),
         )
 
-        if e.error_type == "RATE_LIMIT":
-            user_message = (
-                "Whoa, you're on fire with questions! Give me just a "
-                "moment to catch up, then we can continue. 😊"
-            )
 
+# Streaming AI Chat Endpoint (Server-Sent Events)
+@app.post("/api/chat/stream", tags=["AI"])
+@limiter.limit("20/minute")  # Rate limiting
+async def chat_stream(request: Request, chat_request: ChatRequest):
+    """Stream the chatbot reply as server-sent events.
+
+    Emits a ``data`` frame per generated chunk, then a ``done`` event. A
+    provider failure mid-stream is reported as an ``error`` event carrying
+    the same payload as the 503 response of ``/api/chat``.
+    """
+    trace_id = str(uuid.uuid4())
+
+    logger.info(
+        f"CHAT_STREAM_REQUEST: Received chat message | "
+        f"user_id={chat_request.user_id or 'anonymous'} | "
+        f"message_length={len(chat_request.message)} | "
+        f"trace_id={trace_id} | "
+        f"timestamp={datetime.now(timezone.utc).isoformat()}"
+    )
+
+    ledger: UsageLedger = request.app.state.usage_ledger
+    try:
+        ledger.check_budget(chat_request.user_id, trace_id)
+    except BudgetExceededError as e:
         return JSONResponse(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            content={
-                "error": e.error_type.lower(),
-                "user_message": user_message,
-                "trace_id": e.trace_id,
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content=_chat_budget_payload(e),
+        )
+
+    _, provider = _get_chat_provider(request, trace_id)
+
+    async def event_stream() -> AsyncGenerator[str, None]:
+        with track_token_usage() as usage:
+            try:
+                async for chunk in provider.stream_response(
+                    chat_request.message, trace_id=trace_id
+                ):
+                    yield _sse_event({"delta": chunk})
+            except AIProviderError as e:
+                yield _sse_event(_chat_error_payload(e), event="error")
+                return
+            finally:
+                if usage.total_tokens:
+                    ledger.record(chat_request.user_id, provider.model, usage)
+
+        yield _sse_event(
+            {
+                "tokens_used": usage.total_tokens,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "trace_id": trace_id,
             },
+            event="done",
         )
 
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 # Generate Endpoint (Model-Agnostic Testing)
 @app.post("/generate", tags=["AI"])
 @limiter.limit("5/minute")
 async def generate_response(
     request: Request,
-    generate_request: GenerateRequest = Depends(),
+    generate_request: GenerateRequest = Depends(get_generate_request),
     provider: AIProvider = Depends(get_ai_provider),
 ):
     """Model-agnostic generation endpoint for testing abstraction layer."""
@@ -358,12 +720,19 @@ async def generate_response(
     )
 
     try:
-        response_text = await provider.generate_response(
-            generate_request.prompt, trace_id=trace_id
+        response_text, cached, tokens_used = await _generate_cached(
+            request,
+            provider,
+            generate_request.provider_type,
+            generate_request.prompt,
+            trace_id,
+            generate_request.user_id,
         )
 
         return {
             "response": response_text,
+            "cached": cached,
+            "tokens_used": tokens_used,
             "provider": generate_request.provider_type,
             "model": generate_request.model,
             "trace_id": trace_id,
@@ -380,6 +749,11 @@ async def generate_response(
                 "trace_id": e.trace_id,
             },
         )
+    except BudgetExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=_budget_exceeded_detail(e),
+        )
     except Exception as e:
         logger.error(
             f"GENERATE_ERROR: Unexpected error | "
@@ -395,3 +769,77 @@ async def generate_response(
                 "trace_id": trace_id,
             },
         )
+
+
+# Batch Generate Endpoint (Service-to-Service)
+@app.post(
+    "/generate/batch",
+    tags=["AI"],
+    dependencies=[Depends(require_service_api_key)],
+)
+@limiter.limit("10/minute")
+async def generate_batch_responses(
+    request: Request,
+    batch_request: GenerateBatchRequest = Depends(get_generate_batch_request),
+    provider: AIProvider = Depends(get_batch_ai_provider),
+):
+    """Generate responses for many prompts in one authenticated call.
+
+    Prompts run with bounded concurrency through the same cache and
+    provider protections as /generate. Results are returned in request
+    order, each carrying either a response or its error.
+    """
+    trace_id = str(uuid.uuid4())
+
+    logger.info(
+        f"GENERATE_BATCH_REQUEST: Received batch request | "
+        f"provider={batch_request.provider_type} | "
+        f"model={batch_request.model or 'default'} | "
+        f"size={len(batch_request.prompts)} | "
+        f"trace_id={trace_id}"
+    )
+
+    outcomes = await generate_batch(
+        lambda prompt: _generate_cached(
+            request, provider, batch_request.provider_type, prompt, trace_id
+        ),
+        batch_request.prompts,
+        batch_request.max_concurrency,
+        trace_id,
+        batch_request.provider_type,
+    )
+
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, AIProviderError):
+            results.append(
+                {
+                    "index": index,
+                    "error": {
+                        "error": outcome.error_type,
+                        "message": outcome.message,
+                        "provider": outcome.provider,
+                    },
+                }
+            )
+        else:
+            response_text, cached, tokens_used = outcome
+            results.append(
+                {
+                    "index": index,
+                    "response": response_text,
+                    "cached": cached,
+                    "tokens_used": tokens_used,
+                }
+            )
+
+    failed = sum(1 for result in results if "error" in result)
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "provider": batch_request.provider_type,
+        "model": batch_request.model,
+        "trace_id": trace_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
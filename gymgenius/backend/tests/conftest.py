@@ -0,0 +1,36 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+import asyncio
+import inspect
+import warnings
+
+import pytest  # type: ignore
+from main import limiter  # type: ignore
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Start every test with empty rate-limit windows"""
+    limiter.reset()
+    yield
+    limiter.reset()
+
+
+@pytest.fixture(autouse=True)
+def close_idle_event_loop(request):
+    """Close the spare loop pytest-asyncio installs after async tests.
+
+    Sync tests that call asyncio.run() would otherwise replace it without
+    closing it, and the ResourceWarning surfaces in whichever later test
+    happens to trigger garbage collection.
+    """
+    if not inspect.iscoroutinefunction(request.function):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            try:
+                loop = asyncio.get_event_loop_policy().get_event_loop()
+            except RuntimeError:
+                loop = None
+        if loop is not None and not loop.is_running():
+            loop.close()
+    yield
@@ -0,0 +1,254 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+import asyncio
+import os
+
+import pytest  # type: ignore
+from ai_cache import (  # type: ignore
+    InMemoryCacheBackend,
+    RedisCacheBackend,
+    ResponseCache,
+    SingleFlight,
+    build_cache_key,
+    create_response_cache,
+)
+from ai_provider import AIProviderError  # type: ignore
+from fastapi.testclient import TestClient
+from main import app
+
+
+class FakeRedis:
+    """Minimal in-process stand-in for redis.asyncio.Redis"""
+
+    def __init__(self):
+        self.store = {}
+        self.ttls = {}
+        self.closed = False
+
+    async def get(self, key):
+        value = self.store.get(key)
+        return value.encode() if value is not None else None
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+        self.ttls[key] = ex
+
+    async def aclose(self):
+        self.closed = True
+
+
+class BrokenBackend(InMemoryCacheBackend):
+    async def get(self, key):
+        raise ConnectionError("cache down")
+
+    async def set(self, key, value, ttl_seconds):
+        raise ConnectionError("cache down")
+
+
+class TestCacheKey:
+    def test_normalizes_whitespace_and_case(self):
+        a = build_cache_key("Give me a  3-day\nbeginner split ", "google", "gemini-pro")
+        b = build_cache_key("give me a 3-day beginner split", "GOOGLE", "gemini-pro")
+        assert a == b
+
+    def test_distinguishes_provider_model_and_params(self):
+        base = build_cache_key("hi", "openai", "gpt-4", {"temperature": 0.7})
+        assert base != build_cache_key("hi", "google", "gpt-4", {"temperature": 0.7})
+        assert base != build_cache_key("hi", "openai", "gpt-4o", {"temperature": 0.7})
+        assert base != build_cache_key("hi", "openai", "gpt-4", {"temperature": 0.2})
+
+
+class TestInMemoryCacheBackend:
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("ai_cache.time.monotonic", lambda: now[0])
+        backend = InMemoryCacheBackend()
+        await backend.set("k", "v", ttl_seconds=10)
+        assert await backend.get("k") == "v"
+        now[0] += 10
+        assert await backend.get("k") is None
+        assert len(backend) == 0
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        backend = InMemoryCacheBackend(max_entries=2)
+        await backend.set("a", "1", 60)
+        await backend.set("b", "2", 60)
+        assert await backend.get("a") == "1"  # "b" is now least recent
+        await backend.set("c", "3", 60)
+        assert await backend.get("b") is None
+        assert await backend.get("a") == "1"
+        assert await backend.get("c") == "3"
+
+
+class TestRedisCacheBackend:
+    @pytest.mark.asyncio
+    async def test_round_trip_with_prefix_and_ttl(self):
+        fake = FakeRedis()
+        backend = RedisCacheBackend(fake, prefix="test:")
+        await backend.set("k", "value", ttl_seconds=30)
+        assert fake.ttls["test:k"] == 30
+        assert await backend.get("k") == "value"
+        assert await backend.get("missing") is None
+        await backend.aclose()
+        assert fake.closed is True
+
+
+class TestResponseCache:
+    @pytest.mark.asyncio
+    async def test_get_or_generate_counts_hits_and_misses(self):
+        cache = ResponseCache(InMemoryCacheBackend(), ttl_seconds=60)
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            return "plan"
+
+        assert await cache.get_or_generate("k", generate) == ("plan", False)
+        assert await cache.get_or_generate("k", generate) == ("plan", True)
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_backend_failures_degrade_to_misses(self):
+        cache = ResponseCache(BrokenBackend(), ttl_seconds=60)
+
+        async def generate():
+            return "plan"
+
+        assert await cache.get_or_generate("k", generate) == ("plan", False)
+
+    @pytest.mark.asyncio
+    async def test_disabled_cache_always_generates(self):
+        cache = create_response_cache("none")
+
+        async def generate():
+            return "plan"
+
+        assert await cache.get_or_generate("k", generate) == ("plan", False)
+        assert await cache.get_or_generate("k", generate) == ("plan", False)
+        assert cache.enabled is False
+
+    def test_factory_rejects_unknown_backend(self):
+        with pytest.raises(ValueError, match="Unknown cache backend"):
+            create_response_cache("memcached")
+
+    def test_factory_requires_redis_url(self):
+        with pytest.raises(ValueError, match="redis_url"):
+            create_response_cache("redis")
+
+
+class CountingProvider:
+    def __init__(self):
+        self.model = "dummy"
+        self.calls = 0
+
+    async def generate_response(self, prompt, trace_id=None):
+        self.calls += 1
+        return f"echo: {prompt}"
+
+
+def test_endpoints_report_cached_responses(monkeypatch):
+    provider = CountingProvider()
+    monkeypatch.setattr("main.create_ai_provider", lambda *args, **kwargs: provider)
+    monkeypatch.setitem(os.environ, "GOOGLE_API_KEY", "test")
+    monkeypatch.setitem(os.environ, "AI_PROVIDER", "google")
+    with TestClient(app) as client:
+        first = client.post("/api/chat", json={"message": "Beginner split?"})
+        second = client.post("/api/chat", json={"message": "beginner  split?"})
+        generated = client.post(
+            "/generate", json={"prompt": "Beginner split?", "provider_type": "google"}
+        )
+
+    assert first.json()["cached"] is False
+    assert second.json()["cached"] is True
+    assert second.json()["response"] == first.json()["response"]
+    assert generated.json()["cached"] is True
+    assert provider.calls == 1
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def slow_call():
+            calls.append(1)
+            await release.wait()
+            return "shared"
+
+        waiters = [asyncio.ensure_future(flight.do("k", slow_call)) for _ in range(50)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert len(calls) == 1
+        assert [r for r, _ in results] == ["shared"] * 50
+        assert sum(shared for _, shared in results) == 49
+        assert flight.coalesced == 49
+        assert len(flight) == 0
+
+    @pytest.mark.asyncio
+    async def test_provider_error_reaches_every_waiter(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def failing_call():
+            await release.wait()
+            raise AIProviderError("down", "openai", "API_ERROR", "trace-1")
+
+        waiters = [asyncio.ensure_future(flight.do("k", failing_call)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert all(isinstance(r, AIProviderError) for r in results)
+        assert {r.error_type for r in results} == {"API_ERROR"}
+
+        # A failed call is not remembered; the next caller retries
+        async def ok_call():
+            return "ok"
+
+        assert await flight.do("k", ok_call) == ("ok", False)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def slow_call():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.ensure_future(flight.do("k", slow_call))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", slow_call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+
+        assert await follower == ("done", True)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    @pytest.mark.asyncio
+    async def test_response_cache_coalesces_concurrent_misses(self):
+        cache = ResponseCache(InMemoryCacheBackend(), ttl_seconds=60)
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "plan"
+
+        results = await asyncio.gather(
+            *[cache.get_or_generate("k", generate) for _ in range(20)]
+        )
+        assert len(calls) == 1
+        assert {r for r, _ in results} == {"plan"}
+        assert cache.stats()["coalesced"] == 19
+        assert await cache.get_or_generate("k", generate) == ("plan", True)
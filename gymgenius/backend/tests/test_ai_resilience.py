@@ -0,0 +1,335 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+import asyncio
+import os
+
+import pytest  # type: ignore
+from ai_provider import AIProvider, AIProviderError  # type: ignore
+from ai_resilience import (  # type: ignore
+    Bulkhead,
+    BulkheadProvider,
+    CircuitBreaker,
+    FailoverProvider,
+)
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+from main import app
+
+
+class GatedProvider(AIProvider):
+    """Provider whose calls block until the test releases them"""
+
+    def __init__(self):
+        self.model = "gated"
+        self.model_name = "gated"
+        self.provider_name = "gated"
+        self.release = asyncio.Event()
+        self.calls = 0
+
+    async def generate_response(self, prompt, trace_id=None):
+        self.calls += 1
+        await self.release.wait()
+        return f"done: {prompt}"
+
+
+class TestBulkhead:
+    @pytest.mark.asyncio
+    async def test_limits_concurrency_and_tracks_gauges(self):
+        provider = GatedProvider()
+        bulkhead = Bulkhead("gated", max_concurrent=2, max_queue=5)
+        wrapped = BulkheadProvider(provider, bulkhead)
+
+        tasks = [asyncio.ensure_future(wrapped.generate_response("x")) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        assert provider.calls == 2
+        assert bulkhead.in_flight == 2
+        assert bulkhead.queued == 2
+
+        provider.release.set()
+        results = await asyncio.gather(*tasks)
+        assert results == ["done: x"] * 4
+        assert bulkhead.stats()["in_flight"] == 0
+        assert bulkhead.stats()["queued"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rejects_immediately_when_queue_full(self):
+        provider = GatedProvider()
+        bulkhead = Bulkhead("gated", max_concurrent=1, max_queue=1)
+        wrapped = BulkheadProvider(provider, bulkhead)
+
+        running = asyncio.ensure_future(wrapped.generate_response("a"))
+        waiting = asyncio.ensure_future(wrapped.generate_response("b"))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(AIProviderError) as exc_info:
+            await wrapped.generate_response("c", trace_id="trace-full")
+        assert exc_info.value.error_type == "CAPACITY_EXCEEDED"
+        assert exc_info.value.trace_id == "trace-full"
+        assert bulkhead.rejected == 1
+
+        provider.release.set()
+        await asyncio.gather(running, waiting)
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        provider = GatedProvider()
+        bulkhead = Bulkhead("gated", max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        wrapped = BulkheadProvider(provider, bulkhead)
+
+        running = asyncio.ensure_future(wrapped.generate_response("a"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AIProviderError) as exc_info:
+            await wrapped.generate_response("b")
+        assert exc_info.value.error_type == "QUEUE_TIMEOUT"
+        assert bulkhead.queued == 0
+
+        provider.release.set()
+        await running
+        assert bulkhead.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_slot_released_on_provider_error(self):
+        class FailingProvider(GatedProvider):
+            async def generate_response(self, prompt, trace_id=None):
+                raise AIProviderError("boom", "gated", "API_ERROR", trace_id)
+
+        bulkhead = Bulkhead("gated", max_concurrent=1, max_queue=0)
+        wrapped = BulkheadProvider(FailingProvider(), bulkhead)
+        for _ in range(3):
+            with pytest.raises(AIProviderError) as exc_info:
+                await wrapped.generate_response("x")
+            assert exc_info.value.error_type == "API_ERROR"
+        assert bulkhead.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_streaming_holds_slot_until_exhausted(self):
+        bulkhead = Bulkhead("gated", max_concurrent=1, max_queue=0)
+        wrapped = BulkheadProvider(GatedProvider(), bulkhead)
+        wrapped.provider.release.set()
+
+        chunks = []
+        async for chunk in wrapped.stream_response("x"):
+            assert bulkhead.in_flight == 1
+            chunks.append(chunk)
+        assert chunks == ["done: x"]
+        assert bulkhead.in_flight == 0
+
+
+def test_chat_returns_empathetic_503_when_provider_saturated(monkeypatch):
+    class SlowProvider:
+        model = "slow"
+
+        async def generate_response(self, prompt, trace_id=None):
+            await asyncio.sleep(0.2)
+            return "late"
+
+    monkeypatch.setattr("main.create_ai_provider", lambda *args, **kwargs: SlowProvider())
+    monkeypatch.setitem(os.environ, "GOOGLE_API_KEY", "test")
+    monkeypatch.setitem(os.environ, "AI_PROVIDER", "google")
+    monkeypatch.setitem(os.environ, "AI_GOOGLE_MAX_CONCURRENCY", "1")
+    monkeypatch.setitem(os.environ, "AI_GOOGLE_MAX_QUEUE", "0")
+    monkeypatch.setitem(os.environ, "AI_CACHE_BACKEND", "none")
+
+    with TestClient(app) as client:
+
+        async def burst():
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as http:
+                return await asyncio.gather(
+                    http.post("/api/chat", json={"message": "one"}),
+                    http.post("/api/chat", json={"message": "two"}),
+                )
+
+        first, second = client.portal.call(burst)
+
+    statuses = sorted([first.status_code, second.status_code])
+    assert statuses == [200, 503]
+    rejected = first if first.status_code == 503 else second
+    assert rejected.json()["error"] == "capacity_exceeded"
+    assert "user_message" in rejected.json()
+
+
+class ScriptedProvider(AIProvider):
+    """Provider that fails with a given error_type or answers after a delay"""
+
+    def __init__(self, name, error_type=None, delay=0.0):
+        self.model = name
+        self.model_name = name
+        self.provider_name = name
+        self.error_type = error_type
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_response(self, prompt, trace_id=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error_type:
+            raise AIProviderError("failed", self.provider_name, self.error_type, trace_id)
+        return f"{self.provider_name}: {prompt}"
+
+    async def stream_response(self, prompt, trace_id=None):
+        self.calls += 1
+        if self.error_type:
+            raise AIProviderError("failed", self.provider_name, self.error_type, trace_id)
+        for word in prompt.split():
+            yield word
+
+
+class TestCircuitBreaker:
+    def test_opens_on_sustained_failures_and_recovers_via_probe(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr("ai_resilience.time.monotonic", lambda: now[0])
+        breaker = CircuitBreaker("openai", min_calls=4, open_seconds=10)
+
+        breaker.record_success(10)
+        for _ in range(3):
+            assert breaker.allow_request()
+            breaker.record_failure(10)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow_request() is False
+
+        now[0] += 10
+        assert breaker.allow_request() is True  # half-open probe
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request() is False  # only one probe at a time
+        breaker.record_success(10)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_probe_reopens(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr("ai_resilience.time.monotonic", lambda: now[0])
+        breaker = CircuitBreaker("google", min_calls=1, open_seconds=5)
+        breaker.record_failure(10)
+        now[0] += 5
+        assert breaker.allow_request() is True
+        breaker.record_failure(10)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.times_opened == 2
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker("google", min_calls=2, slow_call_ms=100)
+        breaker.record_success(500)
+        breaker.record_success(500)
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_latency_percentile(self):
+        breaker = CircuitBreaker("google", min_calls=5)
+        assert breaker.latency_percentile(0.95) is None
+        for latency in range(1, 21):
+            breaker.record_success(float(latency))
+        assert breaker.latency_percentile(0.95) == 19.0
+
+
+class TestFailoverProvider:
+    @pytest.mark.asyncio
+    async def test_fails_over_to_secondary(self):
+        primary = ScriptedProvider("google", error_type="API_ERROR")
+        secondary = ScriptedProvider("openai")
+        provider = FailoverProvider(
+            [(primary, CircuitBreaker("google")), (secondary, CircuitBreaker("openai"))]
+        )
+        assert await provider.generate_response("hi") == "openai: hi"
+        assert provider.model == "google"
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_primary(self):
+        primary = ScriptedProvider("google", error_type="RATE_LIMIT")
+        secondary = ScriptedProvider("openai")
+        breaker = CircuitBreaker("google", min_calls=2)
+        provider = FailoverProvider(
+            [(primary, breaker), (secondary, CircuitBreaker("openai"))]
+        )
+        for _ in range(5):
+            await provider.generate_response("hi")
+        assert breaker.state == CircuitBreaker.OPEN
+        assert primary.calls == 2
+        assert secondary.calls == 5
+
+    @pytest.mark.asyncio
+    async def test_raises_last_error_when_all_fail(self):
+        provider = FailoverProvider(
+            [
+                (ScriptedProvider("google", error_type="API_ERROR"), CircuitBreaker("google")),
+                (ScriptedProvider("openai", error_type="RATE_LIMIT"), CircuitBreaker("openai")),
+            ]
+        )
+        with pytest.raises(AIProviderError) as exc_info:
+            await provider.generate_response("hi", trace_id="t-1")
+        assert exc_info.value.error_type == "RATE_LIMIT"
+
+    @pytest.mark.asyncio
+    async def test_all_circuits_open(self):
+        breaker = CircuitBreaker("google", min_calls=1)
+        breaker.record_failure(1)
+        provider = FailoverProvider([(ScriptedProvider("google"), breaker)])
+        with pytest.raises(AIProviderError) as exc_info:
+            await provider.generate_response("hi")
+        assert exc_info.value.error_type == "CIRCUIT_OPEN"
+
+    @pytest.mark.asyncio
+    async def test_hedged_request_wins_when_primary_slow(self):
+        primary = ScriptedProvider("google", delay=1.0)
+        secondary = ScriptedProvider("openai", delay=0.0)
+        breaker = CircuitBreaker("google", min_calls=5)
+        for _ in range(20):
+            breaker.record_success(5.0)  # observed p95 is 5ms
+        provider = FailoverProvider(
+            [(primary, breaker), (secondary, CircuitBreaker("openai"))],
+            hedge_percentile=0.95,
+        )
+
+        assert await provider.generate_response("hi") == "openai: hi"
+        await asyncio.sleep(0)
+        assert primary.cancelled == 1
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_primary_fast(self):
+        primary = ScriptedProvider("google")
+        secondary = ScriptedProvider("openai")
+        breaker = CircuitBreaker("google", min_calls=1)
+        breaker.record_success(1000.0)
+        provider = FailoverProvider(
+            [(primary, breaker), (secondary, CircuitBreaker("openai"))],
+            hedge_percentile=0.95,
+        )
+        assert await provider.generate_response("hi") == "google: hi"
+        assert secondary.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_stream_fails_over_before_first_chunk(self):
+        primary = ScriptedProvider("google", error_type="API_ERROR")
+        secondary = ScriptedProvider("openai")
+        breaker = CircuitBreaker("google")
+        provider = FailoverProvider([(primary, breaker), (secondary, CircuitBreaker("openai"))])
+        chunks = [c async for c in provider.stream_response("push pull legs")]
+        assert chunks == ["push", "pull", "legs"]
+        assert breaker.stats()["failure_rate"] == 1.0
+
+
+def test_chat_fails_over_to_configured_fallback(monkeypatch):
+    providers = {
+        "google": ScriptedProvider("google", error_type="API_ERROR"),
+        "openai": ScriptedProvider("openai"),
+    }
+    monkeypatch.setattr(
+        "main.create_ai_provider",
+        lambda provider_type, api_key, model=None: providers[provider_type],
+    )
+    monkeypatch.setitem(os.environ, "GOOGLE_API_KEY", "test")
+    monkeypatch.setitem(os.environ, "OPENAI_API_KEY", "test")
+    monkeypatch.setitem(os.environ, "AI_PROVIDER", "google")
+    monkeypatch.setitem(os.environ, "AI_FALLBACK_PROVIDER", "openai")
+
+    with TestClient(app) as client:
+        res = client.post("/api/chat", json={"message": "hi"})
+
+    assert res.status_code == 200
+    assert res.json()["response"] == "openai: hi"
@@ -0,0 +1,207 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest  # type: ignore
+from ai_provider import (  # type: ignore
+    AIProvider,
+    AIResponse,
+    GoogleAIProvider,
+    OpenAIProvider,
+    TokenUsage,
+    report_token_usage,
+    track_token_usage,
+)
+from ai_usage import (  # type: ignore
+    BudgetExceededError,
+    JsonlUsageStore,
+    UsageLedger,
+    UsageStore,
+)
+from fastapi.testclient import TestClient
+from main import app
+
+
+class MemoryStore(UsageStore):
+    def __init__(self, fail=False):
+        self.records = []
+        self.fail = fail
+
+    async def write(self, records):
+        if self.fail:
+            raise OSError("disk full")
+        self.records.extend(records)
+
+
+class MeteredProvider(AIProvider):
+    def __init__(self):
+        self.model = "metered"
+        self.calls = 0
+
+    async def generate_response(self, prompt, trace_id=None):
+        self.calls += 1
+        usage = TokenUsage(prompt_tokens=10, completion_tokens=30)
+        report_token_usage(usage)
+        return AIResponse(f"tip: {prompt}", usage)
+
+
+class TestProviderUsage:
+    @pytest.mark.asyncio
+    async def test_openai_reports_usage(self):
+        provider = OpenAIProvider(api_key="test")
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Squat deep"))],
+            usage=SimpleNamespace(prompt_tokens=12, completion_tokens=8),
+        )
+        provider.client.chat.completions.create = AsyncMock(return_value=response)
+
+        with track_token_usage() as usage:
+            result = await provider.generate_response("legs?")
+
+        assert result == "Squat deep"
+        assert result.usage.total_tokens == 20
+        assert usage == TokenUsage(prompt_tokens=12, completion_tokens=8)
+
+    @pytest.mark.asyncio
+    async def test_google_reports_usage(self):
+        provider = GoogleAIProvider(api_key="test")
+        response = SimpleNamespace(
+            text="Rest well",
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=5, candidates_token_count=7
+            ),
+        )
+        provider.model = MagicMock()
+        provider.model.generate_content_async = AsyncMock(return_value=response)
+
+        with track_token_usage() as usage:
+            await provider.generate_response("recovery?")
+
+        assert usage.total_tokens == 12
+
+    def test_reporting_outside_tracking_is_ignored(self):
+        report_token_usage(TokenUsage(prompt_tokens=1))
+
+
+class TestUsageLedger:
+    def test_records_aggregate_per_user_and_model(self):
+        ledger = UsageLedger(MemoryStore())
+        ledger.record("u1", "gpt", TokenUsage(10, 5))
+        ledger.record("u1", "gpt", TokenUsage(1, 2))
+        ledger.record(None, "gpt", TokenUsage(3, 3))
+
+        records = {r["user_id"]: r for r in ledger.snapshot()}
+        assert records["u1"]["requests"] == 2
+        assert records["u1"]["prompt_tokens"] == 11
+        assert records["u1"]["completion_tokens"] == 7
+        assert records["anonymous"]["requests"] == 1
+        assert ledger.tokens_used_today("u1") == 18
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_and_clears_pending(self):
+        store = MemoryStore()
+        ledger = UsageLedger(store)
+        ledger.record("u1", "gpt", TokenUsage(10, 5))
+
+        assert await ledger.flush() == 1
+        assert await ledger.flush() == 0
+        assert store.records[0]["prompt_tokens"] == 10
+        # Daily totals survive a flush so budgets keep applying
+        assert ledger.tokens_used_today("u1") == 15
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_counters(self):
+        store = MemoryStore(fail=True)
+        ledger = UsageLedger(store)
+        ledger.record("u1", "gpt", TokenUsage(10, 5))
+
+        assert await ledger.flush() == 0
+        ledger.record("u1", "gpt", TokenUsage(1, 1))
+        store.fail = False
+        assert await ledger.flush() == 1
+        assert store.records[0]["requests"] == 2
+        assert store.records[0]["prompt_tokens"] == 11
+
+    @pytest.mark.asyncio
+    async def test_jsonl_store_appends_records(self, tmp_path):
+        path = tmp_path / "usage.jsonl"
+        store = JsonlUsageStore(str(path))
+        await store.write([{"user_id": "u1"}])
+        await store.write([{"user_id": "u2"}])
+
+        lines = path.read_text().splitlines()
+        assert [json.loads(line)["user_id"] for line in lines] == ["u1", "u2"]
+
+    def test_budget_enforced_per_user(self):
+        ledger = UsageLedger(MemoryStore(), daily_token_budget=20)
+        ledger.record("u1", "gpt", TokenUsage(10, 10))
+
+        with pytest.raises(BudgetExceededError) as exc:
+            ledger.check_budget("u1", "trace-1")
+        assert exc.value.used == 20
+        ledger.check_budget("u2", "trace-1")
+        ledger.check_budget(None, "trace-1")
+
+    def test_daily_totals_reset_on_new_day(self, monkeypatch):
+        ledger = UsageLedger(MemoryStore(), daily_token_budget=20)
+        ledger.record("u1", "gpt", TokenUsage(10, 10))
+
+        monkeypatch.setattr("ai_usage._today", lambda: "2099-01-01")
+        ledger.check_budget("u1", "trace-1")
+        assert ledger.tokens_used_today("u1") == 0
+
+
+@pytest.fixture
+def metered_env(monkeypatch):
+    provider = MeteredProvider()
+    monkeypatch.setattr("main.create_ai_provider", lambda *args, **kwargs: provider)
+    monkeypatch.setitem(os.environ, "GOOGLE_API_KEY", "test")
+    monkeypatch.setitem(os.environ, "AI_DAILY_TOKEN_BUDGET", "50")
+    return provider
+
+
+def test_chat_reports_tokens_and_enforces_budget(metered_env):
+    with TestClient(app) as client:
+        first = client.post("/api/chat", json={"message": "legs", "user_id": "u1"})
+        assert first.status_code == 200
+        assert first.json()["tokens_used"] == 40
+
+        # Cache hits spend no tokens
+        again = client.post("/api/chat", json={"message": "legs", "user_id": "u1"})
+        assert again.json()["cached"] is True
+        assert again.json()["tokens_used"] == 0
+
+        client.post("/api/chat", json={"message": "arms", "user_id": "u1"})
+        blocked = client.post("/api/chat", json={"message": "back", "user_id": "u1"})
+        assert blocked.status_code == 429
+        assert blocked.json()["error"] == "token_budget_exceeded"
+
+        other = client.post("/api/chat", json={"message": "back", "user_id": "u2"})
+        assert other.status_code == 200
+
+    assert metered_env.calls == 3
+
+
+def test_generate_returns_429_when_budget_spent(metered_env):
+    with TestClient(app) as client:
+        client.app.state.usage_ledger.record("u1", "metered", TokenUsage(50, 0))
+        res = client.post("/generate", json={"prompt": "abs", "user_id": "u1"})
+
+    assert res.status_code == 429
+    assert res.json()["detail"]["error"] == "token_budget_exceeded"
+    assert metered_env.calls == 0
+
+
+def test_usage_flushed_on_shutdown(metered_env, monkeypatch, tmp_path):
+    path = tmp_path / "usage.jsonl"
+    monkeypatch.setitem(os.environ, "AI_USAGE_STORE_PATH", str(path))
+    with TestClient(app) as client:
+        client.post("/api/chat", json={"message": "legs", "user_id": "u1"})
+
+    record = json.loads(path.read_text().splitlines()[0])
+    assert record["user_id"] == "u1"
+    assert record["model"] == "metered"
+    assert record["completion_tokens"] == 30
@@ -0,0 +1,123 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+import asyncio
+import os
+
+import pytest  # type: ignore
+from ai_provider import AIProvider, AIProviderError, generate_batch  # type: ignore
+from fastapi.testclient import TestClient
+from main import app
+
+
+class TrackingProvider(AIProvider):
+    def __init__(self, fail_on=()):
+        self.model = "tracking"
+        self.model_name = "tracking"
+        self.provider_name = "tracking"
+        self.fail_on = set(fail_on)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def generate_response(self, prompt, trace_id=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if prompt in self.fail_on:
+                raise AIProviderError("nope", "tracking", "API_ERROR", trace_id)
+            return f"tip: {prompt}"
+        finally:
+            self.in_flight -= 1
+
+
+class TestGenerateBatch:
+    @pytest.mark.asyncio
+    async def test_results_in_order_with_bounded_concurrency(self):
+        provider = TrackingProvider(fail_on={"p3"})
+        prompts = [f"p{i}" for i in range(10)]
+
+        results = await provider.generate_batch(prompts, max_concurrency=3)
+
+        assert provider.peak == 3
+        assert results[0] == "tip: p0"
+        assert isinstance(results[3], AIProviderError)
+        assert results[9] == "tip: p9"
+
+    @pytest.mark.asyncio
+    async def test_unexpected_errors_are_wrapped_per_item(self):
+        async def generate(prompt):
+            if prompt == "bad":
+                raise RuntimeError("boom")
+            return prompt
+
+        results = await generate_batch(generate, ["ok", "bad"], 2, "trace-1")
+        assert results[0] == "ok"
+        assert results[1].error_type == "UNKNOWN_ERROR"
+        assert results[1].trace_id == "trace-1"
+
+    @pytest.mark.asyncio
+    async def test_rejects_invalid_concurrency(self):
+        with pytest.raises(ValueError):
+            await generate_batch(lambda p: p, ["x"], 0, "trace-1")
+
+
+@pytest.fixture
+def batch_env(monkeypatch):
+    provider = TrackingProvider(fail_on={"bad plan"})
+    monkeypatch.setattr("main.create_ai_provider", lambda *args, **kwargs: provider)
+    monkeypatch.setitem(os.environ, "GOOGLE_API_KEY", "test")
+    monkeypatch.setitem(os.environ, "BATCH_API_KEY", "service-secret")
+    return provider
+
+
+def test_batch_endpoint_requires_api_key(batch_env):
+    with TestClient(app) as client:
+        payload = {"prompts": ["a"]}
+        assert client.post("/generate/batch", json=payload).status_code == 401
+        res = client.post(
+            "/generate/batch", json=payload, headers={"X-API-Key": "wrong"}
+        )
+        assert res.status_code == 401
+
+
+def test_batch_endpoint_rejected_when_key_not_configured(batch_env, monkeypatch):
+    monkeypatch.delitem(os.environ, "BATCH_API_KEY")
+    with TestClient(app) as client:
+        res = client.post(
+            "/generate/batch",
+            json={"prompts": ["a"]},
+            headers={"X-API-Key": "service-secret"},
+        )
+    assert res.status_code == 401
+
+
+def test_batch_endpoint_returns_per_item_results(batch_env):
+    with TestClient(app) as client:
+        res = client.post(
+            "/generate/batch",
+            json={
+                "prompts": ["leg day", "bad plan", "leg day", "<script>x</script>rest"],
+                "max_concurrency": 2,
+            },
+            headers={"X-API-Key": "service-secret"},
+        )
+
+    assert res.status_code == 200
+    body = res.json()
+    assert [r["index"] for r in body["results"]] == [0, 1, 2, 3]
+    assert body["results"][0]["response"] == "tip: leg day"
+    assert body["results"][1]["error"]["error"] == "API_ERROR"
+    assert body["results"][2]["response"] == "tip: leg day"
+    assert "script" not in body["results"][3]["response"]
+    assert body["succeeded"] == 3
+    assert body["failed"] == 1
+    assert batch_env.peak <= 2
+
+
+def test_batch_endpoint_validates_prompts(batch_env):
+    with TestClient(app) as client:
+        headers = {"X-API-Key": "service-secret"}
+        assert client.post("/generate/batch", json={"prompts": []}, headers=headers).status_code == 422
+        assert client.post("/generate/batch", json={"prompts": [""]}, headers=headers).status_code == 422
+        too_many = {"prompts": ["x"] * 101}
+        assert client.post("/generate/batch", json=too_many, headers=headers).status_code == 422
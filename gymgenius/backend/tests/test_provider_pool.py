@@ -0,0 +1,79 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+import os
+
+import pytest  # type: ignore
+from ai_provider import AIProviderPool  # type: ignore
+from fastapi.testclient import TestClient
+from main import app
+
+
+class DummyProvider:
+    def __init__(self, provider_type, api_key, model=None):
+        self.provider_type = provider_type
+        self.model = model or "dummy"
+        self.closed = False
+
+    async def generate_response(self, prompt: str, trace_id=None):
+        return f"echo: {prompt}"
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TestAIProviderPool:
+    def test_same_configuration_reuses_provider(self):
+        pool = AIProviderPool(DummyProvider)
+        first = pool.get("openai", "key-1", "gpt-4")
+        second = pool.get(" OpenAI ", "key-1", "gpt-4")
+        assert first is second
+        assert len(pool) == 1
+
+    def test_distinct_keys_and_models_get_distinct_providers(self):
+        pool = AIProviderPool(DummyProvider)
+        base = pool.get("openai", "key-1")
+        assert pool.get("openai", "key-2") is not base
+        assert pool.get("openai", "key-1", "gpt-4o") is not base
+        assert pool.get("google", "key-1") is not base
+        assert len(pool) == 4
+
+    def test_factory_errors_are_not_cached(self):
+        calls = []
+
+        def failing_factory(provider_type, api_key, model=None):
+            calls.append(provider_type)
+            raise ValueError("Unknown provider type")
+
+        pool = AIProviderPool(failing_factory)
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                pool.get("invalid", "key")
+        assert len(calls) == 2
+        assert len(pool) == 0
+
+    @pytest.mark.asyncio
+    async def test_aclose_closes_and_clears_providers(self):
+        pool = AIProviderPool(DummyProvider)
+        provider = pool.get("openai", "key-1")
+        await pool.aclose()
+        assert provider.closed is True
+        assert len(pool) == 0
+
+
+def test_chat_reuses_pooled_provider(monkeypatch):
+    created = []
+
+    def dummy_factory(provider_type, api_key, model=None):
+        provider = DummyProvider(provider_type, api_key, model)
+        created.append(provider)
+        return provider
+
+    monkeypatch.setattr("main.create_ai_provider", dummy_factory)
+    monkeypatch.setitem(os.environ, "GOOGLE_API_KEY", "test")
+    with TestClient(app) as client:
+        for _ in range(3):
+            res = client.post("/api/chat", json={"message": "hi"})
+            assert res.status_code == 200
+
+    assert len(created) == 1
+    assert created[0].closed is True
@@ -0,0 +1,181 @@
+# flake8: noqa
+# pyright: reportMissingImports=false
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest  # type: ignore
+from ai_provider import (  # type: ignore
+    AIProvider,
+    AIProviderError,
+    GoogleAIProvider,
+    OpenAIProvider,
+)
+from fastapi.testclient import TestClient
+from main import app
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+def _openai_chunk(content):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content))]
+    )
+
+
+def _parse_sse(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        event = "message"
+        data = None
+        for line in frame.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: ") :]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: ") :])
+        events.append((event, data))
+    return events
+
+
+class TestProviderStreaming:
+    @pytest.mark.asyncio
+    async def test_openai_stream_yields_deltas(self):
+        chunks = [
+            _openai_chunk("Hello"),
+            SimpleNamespace(choices=[]),
+            _openai_chunk(None),
+            _openai_chunk(" world"),
+        ]
+        with patch("openai.AsyncOpenAI") as mock_client_class:
+            mock_client = AsyncMock()
+            mock_client.chat.completions.create = AsyncMock(
+                return_value=_aiter(chunks)
+            )
+            mock_client_class.return_value = mock_client
+
+            provider = OpenAIProvider("test-key")
+            result = [c async for c in provider.stream_response("Hi")]
+
+        assert result == ["Hello", " world"]
+        kwargs = mock_client.chat.completions.create.call_args.kwargs
+        assert kwargs["stream"] is True
+
+    @pytest.mark.asyncio
+    async def test_openai_stream_empty_raises(self):
+        with patch("openai.AsyncOpenAI") as mock_client_class:
+            mock_client = AsyncMock()
+            mock_client.chat.completions.create = AsyncMock(
+                return_value=_aiter([_openai_chunk(None)])
+            )
+            mock_client_class.return_value = mock_client
+
+            provider = OpenAIProvider("test-key")
+            with pytest.raises(AIProviderError) as exc_info:
+                [c async for c in provider.stream_response("Hi")]
+
+        assert exc_info.value.error_type == "EMPTY_RESPONSE"
+
+    @pytest.mark.asyncio
+    async def test_google_stream_yields_text_chunks(self):
+        class NoTextChunk:
+            @property
+            def text(self):
+                raise ValueError("no parts")
+
+        chunks = [SimpleNamespace(text="Squat"), NoTextChunk(), SimpleNamespace(text=" deep")]
+        with patch("google.generativeai.configure"):
+            with patch("google.generativeai.GenerativeModel") as mock_model_class:
+                mock_model = MagicMock()
+                mock_model.generate_content_async = AsyncMock(
+                    return_value=_aiter(chunks)
+                )
+                mock_model_class.return_value = mock_model
+
+                provider = GoogleAIProvider("test-key")
+                result = [c async for c in provider.stream_response("Hi")]
+
+        assert result == ["Squat", " deep"]
+        assert mock_model.generate_content_async.call_args.kwargs["stream"] is True
+
+    @pytest.mark.asyncio
+    async def test_google_stream_maps_errors(self):
+        with patch("google.generativeai.configure"):
+            with patch("google.generativeai.GenerativeModel") as mock_model_class:
+                mock_model = MagicMock()
+                mock_model.generate_content_async = AsyncMock(
+                    side_effect=Exception("boom")
+                )
+                mock_model_class.return_value = mock_model
+
+                provider = GoogleAIProvider("test-key")
+                with pytest.raises(AIProviderError) as exc_info:
+                    [c async for c in provider.stream_response("Hi")]
+
+        assert exc_info.value.error_type == "API_ERROR"
+
+    @pytest.mark.asyncio
+    async def test_default_stream_falls_back_to_full_response(self):
+        class WholeProvider(AIProvider):
+            async def generate_response(self, prompt, trace_id=None):
+                return f"full: {prompt}"
+
+        result = [c async for c in WholeProvider().stream_response("x")]
+        assert result == ["full: x"]
+
+
+class StreamingDummyProvider:
+    def __init__(self, chunks, error=None):
+        self.model = "dummy"
+        self.chunks = chunks
+        self.error = error
+
+    async def generate_response(self, prompt, trace_id=None):
+        return "".join(self.chunks)
+
+    async def stream_response(self, prompt, trace_id=None):
+        for chunk in self.chunks:
+            yield chunk
+        if self.error:
+            raise self.error
+
+
+def test_chat_stream_endpoint_emits_chunks_then_done(monkeypatch):
+    provider = StreamingDummyProvider(["Rest ", "day ", "today"])
+    monkeypatch.setattr(
+        "main.create_ai_provider", lambda *args, **kwargs: provider
+    )
+    monkeypatch.setitem(os.environ, "GOOGLE_API_KEY", "test")
+    with TestClient(app) as client:
+        res = client.post("/api/chat/stream", json={"message": "Plan?"})
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(res.text)
+    assert [d["delta"] for e, d in events if e == "message"] == [
+        "Rest ",
+        "day ",
+        "today",
+    ]
+    assert events[-1][0] == "done"
+    assert "trace_id" in events[-1][1]
+
+
+def test_chat_stream_endpoint_reports_provider_error(monkeypatch):
+    error = AIProviderError("slow down", "google", "RATE_LIMIT", "trace-1")
+    provider = StreamingDummyProvider(["Partial"], error=error)
+    monkeypatch.setattr(
+        "main.create_ai_provider", lambda *args, **kwargs: provider
+    )
+    monkeypatch.setitem(os.environ, "GOOGLE_API_KEY", "test")
+    with TestClient(app) as client:
+        res = client.post("/api/chat/stream", json={"message": "Plan?"})
+
+    events = _parse_sse(res.text)
+    assert events[0] == ("message", {"delta": "Partial"})
+    assert events[-1][0] == "error"
+    assert events[-1][1]["error"] == "rate_limit"
+    assert events[-1][1]["trace_id"] == "trace-1"